@@ -1,15 +1,35 @@
+import os
 import uuid
 import time
+import atexit
+import queue
 import sqlite3
 import threading
-from flask import Flask, request, jsonify, render_template_string
-from flask_cors import CORS
+from contextlib import closing, suppress
+from concurrent.futures import Future, TimeoutError
+from flask import Flask, Response, g, request, jsonify
 
 app = Flask(__name__)
-CORS(app)
 
 EXPIRATION_DAYS = 3  # UUID pairs expire after 3 days of inactivity
 EXPIRATION_SECONDS = EXPIRATION_DAYS * 24 * 60 * 60
+CLEANUP_INTERVAL_SECONDS = 60  # Expired pairs are purged at most once a minute
+WRITE_BATCH_SECONDS = 0.005  # Queued writes are grouped into one commit
+WRITE_BATCH_SIZE = 100
+WRITE_TIMEOUT_SECONDS = 1.0
+SQLITE_MAX_INTEGER = 2**63 - 1
+READ_CACHE_SECONDS = 1.0  # Repeat reads within this window skip SQLite
+READ_CACHE_SIZE = 10000
+DB_POOL_SIZE = 16  # Idle connections kept open; extras are closed on checkin
+
+# The live database sits on tmpfs by default, since pairs are disposable anyway.
+# It is seeded from DISK_DB_PATH on startup and copied back there on exit.
+DISK_DB_PATH = "bool_db.db"
+DB_PATH = os.environ.get(
+    "BOOLBIN_DB",
+    "/dev/shm/bool_db.db" if os.path.isdir("/dev/shm") else DISK_DB_PATH,
+)
+DB_IN_MEMORY = DB_PATH.startswith("/dev/shm/")
 
 if __name__ == "__main__":
     BASE_URL = "http://localhost:5000"
@@ -17,14 +37,67 @@ else:
     BASE_URL = "https://zstrout.pythonanywhere.com"
 
 
+def connect_db():
+    # Pooled connections may be handed to a different thread on the next request.
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    # Everything except journal_mode is per-connection, so set it on every open.
+    conn.execute("PRAGMA busy_timeout=5000")
+    # fsync buys nothing when the file lives in RAM.
+    conn.execute(f"PRAGMA synchronous={'OFF' if DB_IN_MEMORY else 'NORMAL'}")
+    conn.execute("PRAGMA cache_size=-10000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA wal_autocheckpoint=1000")
+    return conn
+
+
+def copy_db(source_path, target_path):
+    with closing(sqlite3.connect(source_path)) as source:
+        with closing(sqlite3.connect(target_path)) as target:
+            source.backup(target)
+
+
+def restore_db():
+    # Only seed a fresh tmpfs copy; another worker may already be using it.
+    if os.path.exists(DB_PATH) or not os.path.exists(DISK_DB_PATH):
+        return
+    # Workers forked together can all get this far, so each restores into its
+    # own temp file and links it into place. os.link() fails if DB_PATH already
+    # exists, so only the first copy is published and a database that another
+    # worker has started using is never overwritten.
+    tmp_path = f"{DB_PATH}.{os.getpid()}.tmp"
+    try:
+        copy_db(DISK_DB_PATH, tmp_path)
+        with suppress(FileExistsError):
+            os.link(tmp_path, DB_PATH)
+    finally:
+        with suppress(FileNotFoundError):
+            os.remove(tmp_path)
+
+
+def persist_db():
+    copy_db(DB_PATH, DISK_DB_PATH)
+
+
 def init_db():
-    with sqlite3.connect("bool_db.db") as conn:
+    # The connection's context manager commits on success and rolls back on error.
+    with connect_db() as conn:
         c = conn.cursor()
+        # WAL is persistent in the database file, so this only needs to run once.
+        c.execute("PRAGMA journal_mode=WAL")
+        # Hold the write lock so concurrent workers don't both migrate.
+        c.execute("BEGIN IMMEDIATE")
+        # Databases created before UUIDs were stored as BLOBs are migrated once.
+        columns = {row[1]: row[2] for row in c.execute("PRAGMA table_info(bool_store)")}
+        migrate = columns.get("write_uuid") == "TEXT"
+        if migrate:
+            c.execute("DROP INDEX IF EXISTS idx_created_at")
+            c.execute("DROP INDEX IF EXISTS idx_gravity_exp")
+            c.execute("ALTER TABLE bool_store RENAME TO bool_store_text")
         c.execute(
             """
             CREATE TABLE IF NOT EXISTS bool_store (
-                write_uuid TEXT PRIMARY KEY,
-                read_uuid TEXT UNIQUE NOT NULL,
+                write_uuid BLOB PRIMARY KEY,
+                read_uuid BLOB UNIQUE NOT NULL,
                 bit INTEGER NOT NULL DEFAULT 0,
                 created_at INTEGER NOT NULL,
                 gravity_enabled INTEGER NOT NULL DEFAULT 0,
@@ -32,79 +105,202 @@ def init_db():
             )
         """
         )
-        conn.commit()
-
-
-def cleanup_expired():
-    current_time = int(time.time())
-    with sqlite3.connect("bool_db.db") as conn:
-        c = conn.cursor()
+        if migrate:
+            rows = c.execute("SELECT * FROM bool_store_text").fetchall()
+            c.executemany(
+                """
+                INSERT INTO bool_store (write_uuid, read_uuid, bit, created_at, gravity_enabled, gravity_expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                [
+                    (uuid.UUID(write_uuid).bytes, uuid.UUID(read_uuid).bytes, *rest)
+                    for write_uuid, read_uuid, *rest in rows
+                ],
+            )
+            c.execute("DROP TABLE bool_store_text")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON bool_store(created_at)")
+        # Only rows with gravity enabled can expire, so keep the index small.
         c.execute(
-            "DELETE FROM bool_store WHERE ? - created_at > ?",
-            (current_time, EXPIRATION_SECONDS),
+            """
+            CREATE INDEX IF NOT EXISTS idx_gravity_exp
+            ON bool_store(gravity_expires_at) WHERE gravity_enabled = 1
+        """
         )
-        conn.commit()
+
+
+# Idle connections are kept open so their page cache stays warm between requests.
+_db_pool = queue.SimpleQueue()
+
+
+def checkout_db():
+    try:
+        return _db_pool.get_nowait()
+    except queue.Empty:
+        return connect_db()
+
+
+def checkin_db(conn):
+    if conn.in_transaction:
+        conn.rollback()
+    # Bursts can open many connections, but each may hold a sizeable page cache.
+    if _db_pool.qsize() >= DB_POOL_SIZE:
+        conn.close()
+    else:
+        _db_pool.put(conn)
+
+
+def get_db():
+    if "db" not in g:
+        g.db = checkout_db()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop("db", None)
+    if conn is not None:
+        checkin_db(conn)
+
+
+_last_cleanup = 0
+_cleanup_lock = threading.Lock()
+
+
+def cleanup_expired(now):
+    global _last_cleanup
+    with _cleanup_lock:
+        if now - _last_cleanup < CLEANUP_INTERVAL_SECONDS:
+            return
+        _last_cleanup = now
+    cutoff = now - EXPIRATION_SECONDS
+    # Compare the bare column so the created_at index can be range-scanned. The
+    # purge joins the writer's next batch instead of committing on its own.
+    queue_write("DELETE FROM bool_store WHERE created_at < ?", (cutoff,))
+    conn = get_db()
+    c = conn.cursor()
+    # Find expired gravity bits with a read-only query on the partial index, then
+    # reset just those rows so /all catches up without waiting for a read. The
+    # resets share the writer's next commit.
+    c.execute(
+        """
+        SELECT read_uuid FROM bool_store
+        WHERE gravity_enabled = 1 AND gravity_expires_at <= ?
+    """,
+        (now,),
+    )
+    for (read_uuid,) in c.fetchall():
+        reset_gravity(read_uuid, now)
+
+
+# Everything is public, so the CORS headers are the same on every response.
+_CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET,OPTIONS",
+    "Access-Control-Allow-Headers": "*",
+}
+
+
+@app.before_request
+def cors_preflight():
+    if request.method == "OPTIONS":
+        return "", 204
+
+
+@app.after_request
+def add_cors_headers(response):
+    response.headers.update(_CORS_HEADERS)
+    return response
+
+
+@app.errorhandler(404)
+def not_found(error):
+    # Malformed UUIDs are rejected by the URL converter before any view runs.
+    if request.path.startswith(("/write/", "/read/")):
+        return jsonify({"error": "Invalid UUID"}), 404
+    return error
+
+
+# Compiled once at import instead of on every request.
+_INDEX_TMPL = app.jinja_env.from_string(
+    """
+    <h1>UUIDs Generated</h1>
+    <p><strong>Write UUID:</strong> <a href="{{ BASE_URL }}/write/{{ write_uuid }}">{{ write_uuid }}</a></p>
+    <p><strong>Read UUID:</strong> <a href="{{ BASE_URL }}/read/{{ read_uuid }}">{{ read_uuid }}</a></p>
+
+    <h2>How to Use This Database</h2>
+    <p>This simple boolean database works with UUID-based endpoints for reading and writing values.</p>
+
+    <h3>Write Operation</h3>
+    <p>To update the boolean value, make a GET request with the write UUID and the <code>bit</code> query parameter.
+    Optionally, include the <code>gravity_time</code> parameter (in seconds) to set an expiration time for the bit.
+    For example:</p>
+    <pre>GET {{ BASE_URL }}/write/{{ write_uuid }}?bit=true&gravity_time=5</pre>
+    <p>This will update the value to <strong>true</strong> and automatically reset it after 5 seconds.</p>
+
+    <h3>Read Operation</h3>
+    <p>To read the current boolean value, visit the read UUID endpoint:</p>
+    <pre>GET {{ BASE_URL }}/read/{{ read_uuid }}</pre>
+    <p>The response will be a JSON object like this:</p>
+    <pre>{ "bit": true }</pre>
+
+    <h3>Expiration</h3>
+    <p>UUID pairs automatically expire after {{ EXPIRATION_DAYS }} days of inactivity. Each write refreshes the expiration timer.</p>
+
+    <h3>Error Handling</h3>
+    <p>If an invalid UUID is used, the system returns a 404 error with a JSON message:</p>
+    <pre>{ "error": "Invalid UUID" }</pre>
+
+    <h3>Example Usage with Curl</h3>
+    <p>Write (set to true with gravity):</p>
+    <pre>curl "{{ BASE_URL }}/write/{{ write_uuid }}?bit=true&gravity_time=5"</pre>
+    <p>Read current value:</p>
+    <pre>curl "{{ BASE_URL }}/read/{{ read_uuid }}"</pre>
+
+    <h3>Database Info</h3>
+    <p>Each UUID is random, so there is nothing tying them to anything meaningful. You can view the database contents at:</p>
+    <a href="{{ BASE_URL }}/all">{{ BASE_URL }}/all</a>
+    <p><i>Note that this might not be up to date since expired gravity bits are only reset when they are read or during the cleanup that runs at most once a minute. Reads will always return the current value.</i></p>
+
+    <p><em>Refresh this page to generate new UUID pairs.</em></p>
+    """
+)
 
 
 @app.route("/", methods=["GET"])
 def index():
-    cleanup_expired()
-    write_uuid = str(uuid.uuid4())
-    read_uuid = str(uuid.uuid4())
-    created_at = int(time.time())
-    with sqlite3.connect("bool_db.db") as conn:
-        c = conn.cursor()
-        # New entries are created with gravity disabled by default.
-        c.execute(
-            """
-            INSERT INTO bool_store (write_uuid, read_uuid, bit, created_at, gravity_enabled, gravity_expires_at)
-            VALUES (?, ?, ?, ?, 0, NULL)
-        """,
-            (write_uuid, read_uuid, 0, created_at),
-        )
+    now = int(time.time())
+    cleanup_expired(now)
+    # UUIDs are stored as 16 raw bytes and only formatted as text for display.
+    write_uuid = uuid.uuid4()
+    read_uuid = uuid.uuid4()
+    # New entries are created with gravity disabled by default.
+    insert_sql = """
+        INSERT INTO bool_store (write_uuid, read_uuid, bit, created_at, gravity_enabled, gravity_expires_at)
+        VALUES (?, ?, ?, ?, 0, NULL)
+    """
+    params = (write_uuid.bytes, read_uuid.bytes, 0, now)
+    if not ensure_writer():
+        # This process's writer hasn't come up yet, so nothing guarantees a
+        # queued insert would ever run; store the pair directly instead.
+        conn = get_db()
+        conn.execute(insert_sql, params)
         conn.commit()
-    return render_template_string(
-        """
-        <h1>UUIDs Generated</h1>
-        <p><strong>Write UUID:</strong> <a href="{{ BASE_URL }}/write/{{ write_uuid }}">{{ write_uuid }}</a></p>
-        <p><strong>Read UUID:</strong> <a href="{{ BASE_URL }}/read/{{ read_uuid }}">{{ read_uuid }}</a></p>
-
-        <h2>How to Use This Database</h2>
-        <p>This simple boolean database works with UUID-based endpoints for reading and writing values.</p>
-
-        <h3>Write Operation</h3>
-        <p>To update the boolean value, make a GET request with the write UUID and the <code>bit</code> query parameter.
-        Optionally, include the <code>gravity_time</code> parameter (in seconds) to set an expiration time for the bit.
-        For example:</p>
-        <pre>GET {{ BASE_URL }}/write/{{ write_uuid }}?bit=true&gravity_time=5</pre>
-        <p>This will update the value to <strong>true</strong> and automatically reset it after 5 seconds.</p>
-
-        <h3>Read Operation</h3>
-        <p>To read the current boolean value, visit the read UUID endpoint:</p>
-        <pre>GET {{ BASE_URL }}/read/{{ read_uuid }}</pre>
-        <p>The response will be a JSON object like this:</p>
-        <pre>{ "bit": true }</pre>
-
-        <h3>Expiration</h3>
-        <p>UUID pairs automatically expire after {{ EXPIRATION_DAYS }} days of inactivity. Each write refreshes the expiration timer.</p>
-
-        <h3>Error Handling</h3>
-        <p>If an invalid UUID is used, the system returns a 404 error with a JSON message:</p>
-        <pre>{ "error": "Invalid UUID" }</pre>
-
-        <h3>Example Usage with Curl</h3>
-        <p>Write (set to true with gravity):</p>
-        <pre>curl "{{ BASE_URL }}/write/{{ write_uuid }}?bit=true&gravity_time=5"</pre>
-        <p>Read current value:</p>
-        <pre>curl "{{ BASE_URL }}/read/{{ read_uuid }}"</pre>
-
-        <h3>Database Info</h3>
-        <p>Each UUID is random, so there is nothing tying them to anything meaningful. You can view the database contents at:</p>
-        <a href="{{ BASE_URL }}/all">{{ BASE_URL }}/all</a>
-        <p><i>Note that the might not be up to date since the clean up thread runs every 10 minutes. Reads will always return the current value.</i></p>
-
-        <p><em>Refresh this page to generate new UUID pairs.</em></p>
-        """,
+    else:
+        # The insert rides along with the writer's next batch; nobody can use
+        # the pair before the page has rendered, so don't wait for the commit.
+        future = queue_write(insert_sql, params)
+
+        def log_failed_insert(future):
+            if future.exception() is not None:
+                app.logger.error(
+                    "UUID pair was not stored (write %s, read %s): %r",
+                    write_uuid,
+                    read_uuid,
+                    future.exception(),
+                )
+
+        future.add_done_callback(log_failed_insert)
+    return _INDEX_TMPL.render(
         write_uuid=write_uuid,
         read_uuid=read_uuid,
         BASE_URL=BASE_URL,
@@ -112,72 +308,256 @@ def index():
     )
 
 
-@app.route("/write/<write_uuid>", methods=["GET"])
+# Rows served by read_bit, keyed by read UUID bytes: {read_uuid: (expires, row)}
+_read_cache = {}
+_read_cache_lock = threading.Lock()
+# Bumped by every invalidation so a reader whose SELECT raced a write can tell
+# that its row is stale: {read_uuid: generation}. Keys missing from the dict
+# count as _read_cache_floor, which is raised whenever the dict is pruned.
+_read_cache_generations = {}
+_read_cache_counter = 0
+_read_cache_floor = 0
+
+
+def read_cache_get(read_uuid):
+    with _read_cache_lock:
+        entry = _read_cache.get(read_uuid)
+    if entry is None or entry[0] < time.monotonic():
+        return None
+    return entry[1]
+
+
+def read_cache_generation(read_uuid):
+    with _read_cache_lock:
+        return _read_cache_generations.get(read_uuid, _read_cache_floor)
+
+
+def read_cache_put(read_uuid, row, generation):
+    with _read_cache_lock:
+        if _read_cache_generations.get(read_uuid, _read_cache_floor) != generation:
+            # Invalidated since the caller read the row, so it may be stale.
+            return
+        _read_cache.pop(read_uuid, None)
+        if len(_read_cache) >= READ_CACHE_SIZE:
+            # Dicts keep insertion order, so this evicts the oldest entry.
+            del _read_cache[next(iter(_read_cache))]
+        _read_cache[read_uuid] = (time.monotonic() + READ_CACHE_SECONDS, row)
+
+
+def read_cache_invalidate(read_uuid):
+    global _read_cache_counter, _read_cache_floor
+    with _read_cache_lock:
+        _read_cache.pop(read_uuid, None)
+        if len(_read_cache_generations) >= READ_CACHE_SIZE:
+            # Raising the floor past every handed-out generation keeps readers
+            # that are still in flight from caching after the prune.
+            _read_cache_generations.clear()
+            _read_cache_floor = _read_cache_counter
+        _read_cache_counter += 1
+        _read_cache_generations[read_uuid] = _read_cache_counter
+
+
+# Writes are funnelled through one thread so concurrent requests share a commit.
+_write_queue = None
+_writer_lock = threading.Lock()
+_writer_ready = threading.Event()
+_writer_thread = None
+_writer_pid = None
+
+
+def ensure_writer():
+    """Start db_writer in this process unless it is already running.
+
+    Threads don't survive a fork, so servers that import the app and then fork
+    their workers (gunicorn --preload, uWSGI) need a writer per process. Its
+    queue is created here too, after any gevent monkey-patching in the worker,
+    so that a blocking get() yields to other greenlets.
+    Returns True once the writer has opened its connection.
+    """
+    global _write_queue, _writer_thread, _writer_pid
+    pid = os.getpid()
+    if _writer_pid != pid or not _writer_thread.is_alive():
+        with _writer_lock:
+            if _writer_pid != pid or not _writer_thread.is_alive():
+                if _writer_pid != pid:
+                    _write_queue = queue.SimpleQueue()
+                _writer_ready.clear()
+                _writer_thread = threading.Thread(target=db_writer, daemon=True)
+                _writer_thread.start()
+                _writer_pid = pid
+    return _writer_ready.is_set()
+
+
+def reset_writer_after_fork():
+    # The parent may have been holding the lock at fork time.
+    global _writer_lock
+    _writer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_writer_after_fork)
+
+
+def queue_write(sql, params):
+    """Queue a statement for db_writer and return a future for its first row.
+
+    Updates should return the affected read_uuid so its cached row can be
+    dropped once the batch commits.
+    """
+    ensure_writer()
+    future = Future()
+    _write_queue.put((sql, params, future))
+    return future
+
+
+def db_writer():
+    conn = connect_db()
+    _writer_ready.set()
+    while True:
+        batch = [_write_queue.get()]
+        deadline = time.monotonic() + WRITE_BATCH_SECONDS
+        while len(batch) < WRITE_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_write_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        # Skip writes whose callers gave up waiting and cancelled them.
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            continue
+        results = []
+        try:
+            conn.execute("BEGIN")
+            for sql, params, _ in batch:
+                # A savepoint per statement lets one bad write fail on its own
+                # without rolling back the rest of the batch.
+                conn.execute("SAVEPOINT queued_write")
+                try:
+                    results.append((conn.execute(sql, params).fetchone(), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO queued_write")
+                    app.logger.exception("Queued write failed")
+                    results.append((None, e))
+                conn.execute("RELEASE queued_write")
+            conn.commit()
+        except Exception as e:
+            # Never let the writer exit; every queued write depends on it.
+            app.logger.exception("Failed to commit queued writes")
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                conn = connect_db()
+            for _, _, future in batch:
+                future.set_exception(e)
+            continue
+        for (_, _, future), (row, error) in zip(batch, results):
+            if error is not None:
+                future.set_exception(error)
+                continue
+            if row:
+                read_cache_invalidate(row[0])
+            future.set_result(row)
+
+
+def reset_gravity(read_uuid, now):
+    # Re-check the expiry so a write made since the row was read isn't undone.
+    return queue_write(
+        """
+        UPDATE bool_store
+        SET bit = 0, gravity_enabled = 0, gravity_expires_at = NULL
+        WHERE read_uuid = ? AND gravity_enabled = 1 AND gravity_expires_at <= ?
+        RETURNING read_uuid
+    """,
+        (read_uuid, now),
+    )
+
+
+@app.route("/write/<uuid:write_uuid>", methods=["GET"])
 def write_bit(write_uuid):
+    now = int(time.time())
     bit = request.args.get("bit")
     gravity_time_param = request.args.get("gravity_time")
-    with sqlite3.connect("bool_db.db") as conn:
+    if bit is None:
+        conn = get_db()
         c = conn.cursor()
         c.execute(
-            "SELECT read_uuid FROM bool_store WHERE write_uuid = ?", (write_uuid,)
+            "SELECT read_uuid FROM bool_store WHERE write_uuid = ?", (write_uuid.bytes,)
         )
         row = c.fetchone()
         if not row:
             return jsonify({"error": "Invalid write UUID"}), 404
-        read_uuid = row[0]
-        current_time = int(time.time())
-        if bit is not None:
-            bit_value = 1 if bit.lower() == "true" else 0
-            if gravity_time_param is not None:
-                try:
-                    gravity_seconds = int(gravity_time_param)
-                except ValueError:
-                    return jsonify({"error": "Invalid gravity_time value"}), 400
-                if gravity_seconds > 0:
-                    gravity_enabled = 1
-                    gravity_expires_at = current_time + gravity_seconds
-                else:
-                    gravity_enabled = 0
-                    gravity_expires_at = None
-                c.execute(
-                    """
-                    UPDATE bool_store 
-                    SET bit = ?, created_at = ?, gravity_enabled = ?, gravity_expires_at = ?
-                    WHERE write_uuid = ?
-                """,
-                    (
-                        bit_value,
-                        current_time,
-                        gravity_enabled,
-                        gravity_expires_at,
-                        write_uuid,
-                    ),
-                )
-            else:
-                c.execute(
-                    """
-                    UPDATE bool_store 
-                    SET bit = ?, created_at = ?
-                    WHERE write_uuid = ?
-                """,
-                    (bit_value, current_time, write_uuid),
-                )
-            conn.commit()
-            response = {
-                "message": "Bit updated",
-                "bit": bool(bit_value),
-                "read_uuid": read_uuid,
-            }
-            if gravity_time_param is not None:
-                response["gravity"] = True if gravity_seconds > 0 else False
-                response["gravity_expires_at"] = gravity_expires_at
-            return jsonify(response)
-    return jsonify({"write_uuid": write_uuid, "read_uuid": read_uuid})
-
-
-@app.route("/read/<read_uuid>", methods=["GET"])
+        return jsonify(
+            {"write_uuid": str(write_uuid), "read_uuid": str(uuid.UUID(bytes=row[0]))}
+        )
+    bit_value = 1 if bit.lower() == "true" else 0
+    # None leaves the row's gravity settings untouched.
+    gravity_enabled = None
+    gravity_expires_at = None
+    if gravity_time_param is not None:
+        try:
+            gravity_seconds = int(gravity_time_param)
+        except ValueError:
+            return jsonify({"error": "Invalid gravity_time value"}), 400
+        # The expiry must fit in SQLite's 64-bit INTEGER column.
+        if gravity_seconds > SQLITE_MAX_INTEGER - now:
+            return jsonify({"error": "Invalid gravity_time value"}), 400
+        if gravity_seconds > 0:
+            gravity_enabled = 1
+            gravity_expires_at = now + gravity_seconds
+        else:
+            gravity_enabled = 0
+    # UPDATE ... RETURNING finds and updates the row in a single statement, and
+    # every write shares the same SQL text so it stays in the statement cache.
+    future = queue_write(
+        """
+        UPDATE bool_store
+        SET bit = :bit,
+            created_at = :now,
+            gravity_enabled = COALESCE(:gravity_enabled, gravity_enabled),
+            gravity_expires_at = CASE WHEN :gravity_enabled IS NULL
+                THEN gravity_expires_at ELSE :gravity_expires_at END
+        WHERE write_uuid = :write_uuid
+        RETURNING read_uuid
+    """,
+        {
+            "bit": bit_value,
+            "now": now,
+            "gravity_enabled": gravity_enabled,
+            "gravity_expires_at": gravity_expires_at,
+            "write_uuid": write_uuid.bytes,
+        },
+    )
+    try:
+        row = future.result(timeout=WRITE_TIMEOUT_SECONDS)
+    except TimeoutError:
+        # Drop the write so a reported failure can't commit later. If the writer
+        # has already picked it up, its outcome is only moments away.
+        if future.cancel():
+            return jsonify({"error": "Write timed out"}), 503
+        row = future.result()
+    if not row:
+        return jsonify({"error": "Invalid write UUID"}), 404
+    response = {
+        "message": "Bit updated",
+        "bit": bool(bit_value),
+        "read_uuid": str(uuid.UUID(bytes=row[0])),
+    }
+    if gravity_time_param is not None:
+        response["gravity"] = True if gravity_seconds > 0 else False
+        response["gravity_expires_at"] = gravity_expires_at
+    return jsonify(response)
+
+
+@app.route("/read/<uuid:read_uuid>", methods=["GET"])
 def read_bit(read_uuid):
-    with sqlite3.connect("bool_db.db") as conn:
+    now = int(time.time())
+    row = read_cache_get(read_uuid.bytes)
+    if row is None:
+        generation = read_cache_generation(read_uuid.bytes)
+        conn = get_db()
         c = conn.cursor()
         c.execute(
             """
@@ -185,42 +565,23 @@ def read_bit(read_uuid):
             FROM bool_store 
             WHERE read_uuid = ?
         """,
-            (read_uuid,),
+            (read_uuid.bytes,),
         )
         row = c.fetchone()
         if not row:
             return jsonify({"error": "Invalid read UUID"}), 404
-        bit_value = bool(row[0])
-        gravity_enabled = bool(row[1])
-        gravity_expires_at = row[2]
-        current_time = int(time.time())
-        if (
-            gravity_enabled
-            and gravity_expires_at
-            and current_time >= gravity_expires_at
-        ):
-            bit_value = False
-            c.execute(
-                """
-                UPDATE bool_store 
-                SET bit = 0, gravity_enabled = 0, gravity_expires_at = NULL 
-                WHERE read_uuid = ?
-            """,
-                (read_uuid,),
-            )
-            conn.commit()
-        return jsonify({"bit": bit_value})
+        read_cache_put(read_uuid.bytes, row, generation)
+    bit_value = bool(row[0])
+    gravity_enabled = bool(row[1])
+    gravity_expires_at = row[2]
+    if gravity_enabled and gravity_expires_at and now >= gravity_expires_at:
+        bit_value = False
+        reset_gravity(read_uuid.bytes, now)
+    return jsonify({"bit": bit_value})
 
 
-@app.route("/all", methods=["GET"])
-def all_entries():
-    with sqlite3.connect("bool_db.db") as conn:
-        c = conn.cursor()
-        c.execute(
-            "SELECT read_uuid, bit, gravity_enabled, gravity_expires_at FROM bool_store"
-        )
-        rows = c.fetchall()
-    table_html = """
+_ALL_TMPL = app.jinja_env.from_string(
+    """
     <h1>All UUID Entries</h1>
     <table border="1">
         <tr>
@@ -229,13 +590,40 @@ def all_entries():
             <th>Gravity Enabled</th>
             <th>Gravity Expires At</th>
         </tr>
+    {% for read_uuid, bit, gravity_enabled, gravity_expires_at in rows %}
+    <tr><td>{{ read_uuid }}</td><td>{{ bit != 0 }}</td><td>{{ gravity_enabled != 0 }}</td><td>{{ gravity_expires_at }}</td></tr>
+    {% endfor %}
+    </table>
     """
-    for read_uuid, bit, gravity_enabled, gravity_expires_at in rows:
-        table_html += f"<tr><td>{read_uuid}</td><td>{bool(bit)}</td><td>{bool(gravity_enabled)}</td><td>{gravity_expires_at}</td></tr>"
-    table_html += "</table>"
-    return table_html
+)
+
+
+@app.route("/all", methods=["GET"])
+def all_entries():
+    def rows():
+        # The response outlives the app context, so hold a connection until the
+        # last row is sent instead of borrowing the request's one from get_db().
+        conn = checkout_db()
+        c = conn.cursor()
+        c.arraysize = 200
+        try:
+            c.execute(
+                "SELECT read_uuid, bit, gravity_enabled, gravity_expires_at FROM bool_store"
+            )
+            # Fetch in batches so the table is never held in memory all at once.
+            while batch := c.fetchmany():
+                for read_uuid, *rest in batch:
+                    yield (str(uuid.UUID(bytes=read_uuid)), *rest)
+        finally:
+            c.close()
+            checkin_db(conn)
+
+    return Response(_ALL_TMPL.generate(rows=rows()), mimetype="text/html")
 
 
+if DB_IN_MEMORY:
+    restore_db()
+    atexit.register(persist_db)
 init_db()
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+import os
+
+# Reads are short SQLite lookups, so let each worker multiplex many of them.
+# Database connections come from a pool and are held per request, which makes
+# them per-greenlet under gevent, and WAL lets the readers run concurrently.
+worker_class = "gevent"
+workers = 2
+worker_connections = 1000
+
+
+def post_worker_init(worker):
+    # Pin each worker process to one core so the page cache held by its pooled
+    # SQLite connections stays warm in that core's caches. Workers are spread
+    # round-robin by age, the spawn counter gunicorn gives every worker.
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    cpus = sorted(os.sched_getaffinity(0))
+    cpu = {cpus[worker.age % len(cpus)]}
+    # The app has already started its writer thread, so pin every thread.
+    for tid in os.listdir("/proc/self/task"):
+        os.sched_setaffinity(int(tid), cpu)